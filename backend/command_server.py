@@ -1,21 +1,38 @@
 #!/usr/bin/env python3
 import asyncio
-import json
+import atexit
+import hashlib
+import io
 import logging
+import math
+import orjson
 import os
+import re
 import requests
 import shutil
+import sqlite3
+import subprocess
 import sys
+import tarfile
 import tempfile
 import threading
+import time
 import uuid
-from datetime import datetime
-from flask import Flask, request, jsonify
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from flask import Flask, Response, request, send_file, stream_with_context
+from flask.json.provider import JSONProvider
+from flask_caching import Cache
+from flask_compress import Compress
 from flask_cors import CORS
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Union
+from werkzeug.exceptions import RequestEntityTooLarge
 import claude_code_sdk
+from claude_code_sdk import AssistantMessage, ResultMessage, SystemMessage, TextBlock, ToolResultBlock, ToolUseBlock, UserMessage
 from claude_code_sdk._errors import CLIJSONDecodeError
-from git import Repo, InvalidGitRepositoryError
+from git import GitCommandError, Repo, InvalidGitRepositoryError
 
 # Configure logging
 logging.basicConfig(
@@ -28,8 +45,237 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Server state (spilled task records, task output) lives outside the task workspaces
+DATA_DIR = os.environ.get('JUNIOR_DATA_DIR', os.path.join(os.path.expanduser('~'), '.junior'))
+# Maximum number of task records kept in memory before older finished ones are spilled to SQLite
+MAX_TASKS_IN_MEMORY = int(os.environ.get('JUNIOR_MAX_TASKS_IN_MEMORY', '256'))
+# Finished tasks and their workspaces are removed after this many hours
+TASK_TTL_HOURS = float(os.environ.get('JUNIOR_TASK_TTL_HOURS', '24'))
+SWEEP_INTERVAL_SECONDS = 600
+# Shallow clone per repository that new task workspaces are copied from, at <owner>/<name>
+TEMPLATE_DIR = os.path.join(DATA_DIR, 'templates')
+# In-progress template clones; owners can't contain dots, so this never clashes with an owner directory
+TEMPLATE_PARTIAL_DIR = os.path.join(TEMPLATE_DIR, '.partial')
+# Repositories are GitHub owner/name pairs; "." and ".." names are rejected separately
+REPOSITORY_PATTERN = re.compile(r'^[A-Za-z0-9-]+/[A-Za-z0-9_.-]+$')
+# Git's empty tree, used as the diff base in repositories without any commits yet
+EMPTY_TREE_SHA = '4b825dc642cb6eb9a060e54bf8d69288fbee4904'
+# Templates not refreshed for this long (or since startup) are fetched before their next copy
+TEMPLATE_TTL_SECONDS = int(os.environ.get('JUNIOR_TEMPLATE_TTL_SECONDS', '600'))
+# Task workspaces go on RAM-backed /dev/shm when available, otherwise the system temp dir
+TMP_ROOT = os.environ.get('JUNIOR_TMP_ROOT') or (
+    '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else tempfile.gettempdir()
+)
+# Idle stream connections get a keepalive comment this often
+STREAM_KEEPALIVE_SECONDS = 15
+# Upper bound on how long GET /status/<task_id>?wait=N holds the request open
+MAX_STATUS_WAIT_SECONDS = 60
+# Timeout for each GitHub API call made while creating a pull request
+GITHUB_TIMEOUT_SECONDS = 30
+# Files in task content listings larger than this are listed without their content
+MAX_CONTENT_FILE_SIZE = 1_000_000
+# Task content files are read this many at a time while the listing streams out
+CONTENT_READ_BATCH_SIZE = 64
+# Directories never included in task content listings
+SKIPPED_DIRECTORIES = {'.git', 'node_modules'}
+# Largest request body accepted; POST bodies are small JSON objects
+MAX_REQUEST_BODY_SIZE = 64 * 1024
+# Cache backend for polled GET responses; RedisCache (needs the redis package) when a URL is set
+CACHE_REDIS_URL = os.environ.get('JUNIOR_CACHE_REDIS_URL')
+# Seconds a cached /status response and a cached task listing stay valid
+STATUS_CACHE_TIMEOUT = 2
+LIST_CACHE_TIMEOUT = 10
+# Extensions listed as binary without attempting to read them
+BINARY_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.webp', '.pdf',
+    '.zip', '.gz', '.tar', '.tgz', '.bz2', '.xz', '.7z', '.jar',
+    '.exe', '.dll', '.so', '.dylib', '.o', '.a', '.pyc', '.class', '.wasm',
+    '.woff', '.woff2', '.ttf', '.otf', '.mp3', '.mp4', '.mov', '.wav', '.sqlite', '.db'
+}
+
+API_DOCS = """API Endpoints:
+  GET / - This endpoint list
+  POST /execute - Submit a coding task for execution
+  GET /status/<task_id>?wait=N - Get status of a specific task, waiting up to N seconds for it to finish
+  GET /output/<task_id> - Get the messages of a task as NDJSON
+  GET /events/<task_id> - Stream task messages and the final status as server-sent events
+  GET /stream/<task_id> - Alias of /events/<task_id>
+  GET /content/<task_id>?mode=full|summary&metadata=1&raw=1 - Get task content (git diff or changed files for repos, files otherwise), just its count, or raw text/tar
+  DELETE /delete/<task_id> - Delete a task and clean up its temp directory
+  POST /create-pr/<task_id> - Create a GitHub pull request for task changes
+  POST /feedback/<task_id> - Continue a task's Claude session with feedback
+  GET /tasks - List all tasks
+  GET /running - List running tasks
+  GET /completed - List completed tasks
+"""
+
+class OrjsonProvider(JSONProvider):
+    """Route jsonify and request.get_json through orjson
+
+    Output is compact and unsorted by default, matching the old JSONIFY_PRETTYPRINT_REGULAR
+    and JSON_SORT_KEYS settings that Flask no longer reads from the app config.
+    """
+    
+    compact = True
+    sort_keys = False
+    
+    def dumps(self, obj, **kwargs) -> str:
+        option = 0
+        if not self.compact:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BODY_SIZE
+# Gzip JSON responses (diffs and file listings) above 1KB when the client accepts it
+app.config['COMPRESS_MIN_SIZE'] = 1024
+app.config['COMPRESS_ALGORITHM'] = 'gzip'
+app.config['COMPRESS_ALGORITHM_STREAMING'] = 'gzip'
+Compress(app)
 CORS(app)
+cache = Cache(app, config={
+    'CACHE_TYPE': 'RedisCache', 'CACHE_REDIS_URL': CACHE_REDIS_URL
+} if CACHE_REDIS_URL else {'CACHE_TYPE': 'SimpleCache'})
+
+def is_cacheable(response) -> bool:
+    """Only successful responses are cached, never errors"""
+    return response.status_code == 200
+
+def ojsonify(obj, status: int = 200):
+    """Build a JSON response with orjson, which also serializes datetimes natively"""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# Media types a raw /content response can be served as, by content type
+RAW_CONTENT_MIMETYPES = {
+    "files": ("application/x-tar", "application/octet-stream"),
+    "diff": ("text/plain",),
+    "diff_summary": ("text/plain",),
+}
+
+def raw_content_response(content_data: Dict) -> Response:
+    """Return task content without JSON escaping: diffs and summaries as plain text, files as a tar stream"""
+    content = content_data["content"]
+    if content_data["content_type"] == "files":
+        if isinstance(content, list):
+            content = stream_tar([], "")
+        return Response(stream_with_context(content), mimetype='application/x-tar')
+    if content_data["content_type"] == "diff_summary" and content:
+        content = "".join(
+            "\t".join(filter(None, (change["status"], change.get("old_path"), change["path"]))) + "\n"
+            for change in content
+        )
+    return Response(content or "", mimetype='text/plain')
+
+def list_response(items_key: str, items: List[Dict], count_key: str):
+    """Build a task listing response, splicing the serialized items into a fixed envelope"""
+    body = b'{"%s":%s,"%s":%d}' % (items_key.encode(), orjson.dumps(items), count_key.encode(), len(items))
+    return app.response_class(body, mimetype='application/json')
+
+def stream_json_object(fields: Dict, content) -> Iterator[bytes]:
+    """Yield fields as a JSON object with a trailing content field, written an item at a time when content is an iterator"""
+    yield orjson.dumps(fields)[:-1] + b',"content":'
+    if not isinstance(content, Iterator):
+        yield orjson.dumps(content) + b"}"
+        return
+    yield b"["
+    try:
+        for i, item in enumerate(content):
+            yield (b"," if i else b"") + orjson.dumps(item)
+    except Exception as e:
+        # Headers are already sent, so end the list early with an error field that marks it as truncated
+        logger.error(f"Error streaming content: {e}", exc_info=True)
+        yield b'],"error":' + orjson.dumps(f"Content truncated: {e}") + b"}"
+        return
+    yield b"]}"
+
+# Shared session so GitHub API calls reuse pooled keep-alive connections
+github_session = requests.Session()
+github_session.headers.update({'Accept': 'application/vnd.github.v3+json'})
+
+def format_tool_use_block(block: ToolUseBlock) -> List[str]:
+    # Format tool use more clearly without interfering with code blocks
+    tool_input = str(block.input) if hasattr(block, 'input') else ""
+    lines = [f"🔧 Using tool: {block.name}"]
+    if block.name == "Write" and hasattr(block, 'input') and 'file_path' in block.input:
+        file_path = block.input.get('file_path', 'unknown')
+        lines.append(f"📝 Writing file: {file_path}")
+    elif tool_input and len(tool_input) < 200:
+        lines.append(f"Input: {tool_input}")
+    return lines
+
+def format_tool_result_block(block: ToolResultBlock) -> List[str]:
+    if block.is_error:
+        return [f"❌ Tool Error: {block.content}"]
+    # Limit tool result output to prevent overwhelming display
+    result_content = str(block.content)
+    if len(result_content) > 500:
+        result_content = result_content[:500] + "... (truncated)"
+    return [f"✅ Tool Result: {result_content}"]
+
+# Formatters for assistant message content blocks, keyed by block class
+BLOCK_FORMATTERS = {
+    TextBlock: lambda block: [block.text],
+    ToolUseBlock: format_tool_use_block,
+    ToolResultBlock: format_tool_result_block,
+}
+
+def iter_files(directory: str):
+    """Recursively yield DirEntry objects for regular files, skipping SKIPPED_DIRECTORIES"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIPPED_DIRECTORIES:
+                    yield from iter_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+def read_file_entry(entry: os.DirEntry, root: str) -> Dict:
+    """Build the content listing item for a file, using the stat cached on the DirEntry"""
+    relative_path = os.path.relpath(entry.path, root)
+    size = entry.stat(follow_symlinks=False).st_size
+    _, ext = os.path.splitext(entry.name)
+    file_type = ext[1:] if ext else 'text'
+    
+    if ext.lower() in BINARY_EXTENSIONS:
+        return {"path": relative_path, "name": entry.name, "type": "binary", "content": "[Binary file]", "size": size}
+    if size > MAX_CONTENT_FILE_SIZE:
+        return {"path": relative_path, "name": entry.name, "type": file_type, "content": "[File too large]", "size": size}
+    
+    try:
+        with open(entry.path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        return {"path": relative_path, "name": entry.name, "type": file_type, "content": content, "size": size}
+    except (UnicodeDecodeError, PermissionError):
+        # Skip binary files or files we can't read
+        return {"path": relative_path, "name": entry.name, "type": "binary", "content": "[Binary file]", "size": size}
+
+def stream_tar(entries: List[os.DirEntry], root: str) -> Iterator[bytes]:
+    """Stream files as an uncompressed tar archive, yielding output after each file is added"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w|') as tar:
+        for entry in entries:
+            try:
+                tar.add(entry.path, arcname=os.path.relpath(entry.path, root), recursive=False)
+            except OSError as e:
+                logger.warning("Skipping %s in archive: %s", entry.path, e)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def files_etag(entries: List[os.DirEntry]) -> str:
+    """Hash the path, size and mtime of every file, which changes whenever the listing would"""
+    digest = hashlib.blake2b(digest_size=16)
+    for entry in entries:
+        stat = entry.stat(follow_symlinks=False)
+        digest.update(f"{entry.path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
 
 class TaskStatus:
     def __init__(self, task_id: str, task: str, original_task: str = None):
@@ -40,114 +286,348 @@ class TaskStatus:
         self.status = "running"
         self.start_time = datetime.now()
         self.end_time = None
-        self.output = ""
         self.error = ""
         self.return_code = None
         self.temp_dir = None
         self.session_id = None
+        self.message_count = 0  # Messages appended to the task's output so far
+        self.repo: Optional[Repo] = None  # Cached Repo for the workspace, if it is a git repository
+        self.repo_lock = threading.Lock()  # Held while using repo, since GitPython objects are not thread-safe
+
+    def to_record(self) -> Dict:
+        """Serialize the task for the spill store (output is kept on disk separately)"""
+        return {
+            "id": self.id,
+            "task": self.task,
+            "original_task": self.original_task,
+            "feedback_history": self.feedback_history,
+            "status": self.status,
+            "start_time": self.start_time.isoformat(),
+            "end_time": self.end_time.isoformat() if self.end_time else None,
+            "error": self.error,
+            "return_code": self.return_code,
+            "temp_dir": self.temp_dir,
+            "session_id": self.session_id
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict) -> 'TaskStatus':
+        """Rebuild a task from a spill store record"""
+        task = cls(record["id"], record["task"], record["original_task"])
+        task.feedback_history = record["feedback_history"]
+        task.status = record["status"]
+        task.start_time = datetime.fromisoformat(record["start_time"])
+        task.end_time = datetime.fromisoformat(record["end_time"]) if record["end_time"] else None
+        task.error = record["error"]
+        task.return_code = record["return_code"]
+        task.temp_dir = record["temp_dir"]
+        task.session_id = record["session_id"]
+        return task
 
 class TaskServer:
     def __init__(self):
-        self.tasks: Dict[str, TaskStatus] = {}
+        # LRU of task records; least recently used finished tasks are spilled to SQLite
+        self.tasks: OrderedDict[str, TaskStatus] = OrderedDict()
         self.lock = threading.Lock()
+        # Notified (under self.lock) whenever a task gains a message or changes status
+        self.task_updated = threading.Condition(self.lock)
+        os.makedirs(os.path.join(DATA_DIR, 'output'), exist_ok=True)
+        self.db_path = os.path.join(DATA_DIR, 'tasks.db')
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        # WAL lets spilled_tasks read on its own connection while this one writes
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS tasks (id TEXT PRIMARY KEY, json TEXT NOT NULL)")
+        self.db.commit()
+        # Per-template locks (guarded by self.lock) and last refresh times (guarded by the template's lock)
+        self.template_locks: Dict[str, threading.Lock] = {}
+        self.template_refreshed: Dict[str, float] = {}
+        # Every Claude task runs as a coroutine on this single shared event loop
+        self.loop = asyncio.new_event_loop()
+        # Blocking git/filesystem calls are offloaded to a bounded pool so they never stall the loop
+        self.task_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="task-io")
+        self.loop.set_default_executor(self.task_executor)
+        # Reads file bodies for task content listings in parallel
+        self.content_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="content-read")
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, name="task-loop", daemon=True)
+        self.stopped = False
+        self.loop_thread.start()
+        asyncio.run_coroutine_threadsafe(self.sweep_expired_tasks_periodically(), self.loop)
+
+    async def cancel_pending_tasks(self):
+        current = asyncio.current_task()
+        pending = [t for t in asyncio.all_tasks() if t is not current]
+        for t in pending:
+            t.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def shutdown(self):
+        """Stop the shared task loop at process exit, cancelling running tasks so their Claude CLI processes exit too"""
+        # Runs from gunicorn's worker_exit hook and again from atexit
+        if self.stopped:
+            return
+        self.stopped = True
+        logger.info("Shutting down task loop")
+        try:
+            asyncio.run_coroutine_threadsafe(self.cancel_pending_tasks(), self.loop).result(timeout=5)
+        except Exception as e:
+            logger.warning("Error cancelling pending tasks: %s", e)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=5)
+        # Persist the in-memory records too, so the next process can list and sweep them
+        with self.lock:
+            for task in self.tasks.values():
+                if task.status == "running":
+                    task.status = "failed"
+                    task.end_time = datetime.now()
+                    task.error = "Server shut down before the task finished"
+                    task.return_code = -1
+                self.db.execute("INSERT OR REPLACE INTO tasks (id, json) VALUES (?, ?)", (task.id, orjson.dumps(task.to_record()).decode()))
+            self.db.commit()
+        # Don't wait for executor threads, since a clone can take minutes. Queued work is dropped and the
+        # interpreter joins whatever is still running as it exits. shutdown_default_executor is avoided
+        # because it starts a thread, which Python 3.12 refuses to do from atexit.
+        self.task_executor.shutdown(wait=False, cancel_futures=True)
+        if not self.loop.is_running():
+            self.loop.close()
+        self.content_executor.shutdown(wait=False)
+        self.db.close()
+
+    def add_task(self, task_status: TaskStatus):
+        """Track a task in memory, spilling the least recently used finished tasks. Caller holds self.lock."""
+        self.tasks[task_status.id] = task_status
+        self.tasks.move_to_end(task_status.id)
+        if len(self.tasks) <= MAX_TASKS_IN_MEMORY:
+            return
+        # Running tasks are still being updated in place, so only finished ones can be evicted
+        evictable = [t for t in self.tasks.values() if t.status != "running"]
+        for task in evictable[:len(self.tasks) - MAX_TASKS_IN_MEMORY]:
+            del self.tasks[task.id]
+            if task.repo is not None:
+                # Closing waits for the Repo's lock, so do it off the caller's thread
+                self.content_executor.submit(self.close_repo, task)
+            self.db.execute("INSERT OR REPLACE INTO tasks (id, json) VALUES (?, ?)", (task.id, orjson.dumps(task.to_record()).decode()))
+            logger.debug("Spilled task %s to task database", task.id)
+        self.db.commit()
+
+    def find_task(self, task_id: str) -> Optional[TaskStatus]:
+        """Look up a task in memory, falling back to the spill store. Caller holds self.lock."""
+        task = self.tasks.get(task_id)
+        if task is not None:
+            self.tasks.move_to_end(task_id)
+            return task
+        row = self.db.execute("SELECT json FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        self.db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        self.db.commit()
+        task = TaskStatus.from_record(orjson.loads(row[0]))
+        self.add_task(task)
+        return task
+
+    def close_repo(self, task: TaskStatus):
+        """Stop the git cat-file processes behind a task's cached Repo; they restart if a feedback task sharing it uses it again"""
+        with task.repo_lock:
+            task.repo.close()
+
+    def spilled_tasks(self) -> List[TaskStatus]:
+        """Load every task record from the spill store on a separate connection. Caller must not hold self.lock."""
+        db = sqlite3.connect(self.db_path)
+        try:
+            return [TaskStatus.from_record(orjson.loads(row[0])) for row in db.execute("SELECT json FROM tasks")]
+        finally:
+            db.close()
+
+    def all_tasks(self) -> List[TaskStatus]:
+        """Snapshot in-memory tasks under the lock, then merge in spilled ones read outside it"""
+        with self.lock:
+            tasks = {t.id: t for t in self.tasks.values()}
+        # In-memory records win over spilled copies; a task reloaded mid-read shows up on the next call
+        for task in self.spilled_tasks():
+            tasks.setdefault(task.id, task)
+        return list(tasks.values())
+
+    def output_path(self, task_id: str) -> str:
+        return os.path.join(DATA_DIR, 'output', f"{task_id}.ndjson")
+
+    def record_message(self, task_id: str, message_data: Dict[str, str]):
+        """Append a message to the task's NDJSON output as it arrives and wake up stream readers"""
+        with open(self.output_path(task_id), 'ab') as f:
+            f.write(orjson.dumps(message_data) + b"\n")
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is not None:
+                task.message_count += 1
+            self.task_updated.notify_all()
+
+    def read_task_messages(self, task_id: str, offset: int = 0) -> tuple[List[str], int]:
+        """Read complete NDJSON lines from byte offset, returning them with the offset to resume from"""
+        try:
+            with open(self.output_path(task_id), 'rb') as f:
+                # Offsets come from clients via Last-Event-ID, so only resume right after a newline
+                if offset:
+                    f.seek(offset - 1)
+                    if f.read(1) != b"\n":
+                        logger.debug("Offset %s is not a line boundary in output of task %s, restarting", offset, task_id)
+                        offset = 0
+                f.seek(offset)
+                lines = []
+                for line in iter(f.readline, b''):
+                    # A line without its newline is still being written
+                    if not line.endswith(b"\n"):
+                        break
+                    lines.append(line[:-1].decode('utf-8'))
+                    offset = f.tell()
+                return lines, offset
+        except FileNotFoundError:
+            return [], offset
+
+    def read_task_output(self, task_id: str) -> str:
+        """Return the task's messages so far as a JSON array string"""
+        lines, _ = self.read_task_messages(task_id)
+        return "[" + ",".join(lines) + "]" if lines else ""
+
+    def stream_task_messages(self, task_id: str, offset: int = 0):
+        """Yield new messages as server-sent events, then a final status event once the task finishes.
+
+        Event ids are output offsets, so a client reconnecting with Last-Event-ID only receives what it missed.
+        """
+        seen = None
+        while True:
+            with self.lock:
+                task = self.find_task(task_id)
+                if task is None:
+                    return
+                if seen is not None:
+                    self.task_updated.wait_for(
+                        lambda: task.message_count > seen or task.status != "running",
+                        timeout=STREAM_KEEPALIVE_SECONDS
+                    )
+                seen = task.message_count
+                finished = task.status != "running"
+            
+            lines, offset = self.read_task_messages(task_id, offset)
+            for i, line in enumerate(lines):
+                if i == len(lines) - 1:
+                    yield f"id: {offset}\n"
+                yield f"event: message\ndata: {line}\n\n"
+            
+            if finished:
+                status = {"status": task.status, "return_code": task.return_code, "error": task.error, "end_time": task.end_time}
+                yield f"event: status\ndata: {orjson.dumps(status).decode()}\n\n"
+                return
+            if not lines:
+                yield ": keepalive\n\n"
+
+    async def sweep_expired_tasks_periodically(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+            try:
+                await asyncio.to_thread(self.sweep_expired_tasks)
+            except Exception as e:
+                logger.error(f"Error sweeping expired tasks: {e}", exc_info=True)
+
+    def sweep_expired_tasks(self):
+        """Delete finished tasks older than TASK_TTL_HOURS along with their workspaces"""
+        cutoff = datetime.now() - timedelta(hours=TASK_TTL_HOURS)
+        all_tasks = self.all_tasks()
+        expired = [t for t in all_tasks if t.status != "running" and t.end_time and t.end_time < cutoff]
+        if not expired:
+            return
+        expired_ids = {t.id for t in expired}
+        # Feedback tasks share their parent's workspace, so keep it while any task using it is still live
+        live_dirs = {t.temp_dir for t in all_tasks if t.id not in expired_ids}
+        logger.info("Sweeping %s expired tasks", len(expired))
+        for task in expired:
+            self.delete_task(task.id, remove_workspace=task.temp_dir not in live_dirs)
+    
+    def format_system_message(self, message: SystemMessage, task_id: str) -> str:
+        return str(message.data)
+
+    def format_result_message(self, message: ResultMessage, task_id: str) -> str:
+        # Capture session ID if available
+        if hasattr(message, 'session_id') and message.session_id:
+            with self.lock:
+                self.tasks[task_id].session_id = message.session_id
+        # Format result message as readable text
+        result_parts = []
+        if hasattr(message, 'total_cost_usd') and message.total_cost_usd:
+            result_parts.append(f"Cost: ${message.total_cost_usd:.4f}")
+        if hasattr(message, 'duration_ms') and message.duration_ms:
+            result_parts.append(f"Duration: {message.duration_ms}ms")
+        if hasattr(message, 'num_turns') and message.num_turns:
+            result_parts.append(f"Turns: {message.num_turns}")
+        if hasattr(message, 'is_error') and message.is_error:
+            result_parts.append("Status: Error")
+        else:
+            result_parts.append("Status: Success")
+        current_session = self.tasks[task_id].session_id
+        if current_session:
+            result_parts.append(f"Session: {current_session}")
+        return " | ".join(result_parts)
+
+    def format_user_message(self, message: UserMessage, task_id: str) -> str:
+        return str(message.content)
+
+    def format_assistant_message(self, message: AssistantMessage, task_id: str) -> str:
+        content_data = []
+        for block in message.content:
+            formatter = BLOCK_FORMATTERS.get(type(block))
+            if formatter:
+                content_data.extend(formatter(block))
+            else:
+                content_data.append(str(block))
+        return "\n".join(content_data)
+
+    # Dispatch on the message class rather than comparing class names per message
+    MESSAGE_FORMATTERS = {
+        SystemMessage: format_system_message,
+        ResultMessage: format_result_message,
+        UserMessage: format_user_message,
+        AssistantMessage: format_assistant_message,
+    }
     
     def process_claude_message(self, message, task_id: str) -> Dict[str, str]:
         """Process a Claude message and return formatted message data"""
-        message_data = {}
-
-        match type(message).__name__:
-            case "SystemMessage":
-                message_data["type"] = "SystemMessage"
-                message_data["content"] = str(message.data)
-            case "ResultMessage":
-                message_data["type"] = "ResultMessage"
-                # Capture session ID if available
-                if hasattr(message, 'session_id') and message.session_id:
-                    with self.lock:
-                        self.tasks[task_id].session_id = message.session_id
-                # Format result message as readable text
-                result_parts = []
-                if hasattr(message, 'total_cost_usd') and message.total_cost_usd:
-                    result_parts.append(f"Cost: ${message.total_cost_usd:.4f}")
-                if hasattr(message, 'duration_ms') and message.duration_ms:
-                    result_parts.append(f"Duration: {message.duration_ms}ms")
-                if hasattr(message, 'num_turns') and message.num_turns:
-                    result_parts.append(f"Turns: {message.num_turns}")
-                if hasattr(message, 'is_error') and message.is_error:
-                    result_parts.append("Status: Error")
-                else:
-                    result_parts.append("Status: Success")
-                current_session = self.tasks[task_id].session_id
-                if current_session:
-                    result_parts.append(f"Session: {current_session}")
-                message_data["content"] = " | ".join(result_parts)
-
-            case "UserMessage":
-                message_data["type"] = "UserMessage"
-                message_data["content"] = str(message.content)
-            
-            case "AssistantMessage":
-                message_data["type"] = "AssistantMessage"
-                content_data = []
-                for block in message.content:
-                    match type(block).__name__:
-                        case "TextBlock":
-                            content_data.append(block.text)
-                        case "ToolUseBlock":
-                            # Format tool use more clearly without interfering with code blocks
-                            tool_input = str(block.input) if hasattr(block, 'input') else ""
-                            content_data.append(f"🔧 Using tool: {block.name}")
-                            if block.name == "Write" and hasattr(block, 'input') and 'file_path' in block.input:
-                                file_path = block.input.get('file_path', 'unknown')
-                                content_data.append(f"📝 Writing file: {file_path}")
-                            elif tool_input and len(tool_input) < 200:
-                                content_data.append(f"Input: {tool_input}")
-                        case "ToolResultBlock":
-                            if block.is_error:
-                                content_data.append(f"❌ Tool Error: {block.content}")
-                            else:
-                                # Limit tool result output to prevent overwhelming display
-                                result_content = str(block.content)
-                                if len(result_content) > 500:
-                                    result_content = result_content[:500] + "... (truncated)"
-                                content_data.append(f"✅ Tool Result: {result_content}")
-                        case _:
-                            content_data.append(str(block))
-                message_data["content"] = "\n".join(content_data)
-        
-        return message_data
+        message_type = type(message)
+        formatter = self.MESSAGE_FORMATTERS.get(message_type)
+        content = formatter(self, message, task_id) if formatter else str(message)
+        return {"type": message_type.__name__, "content": content}
     
     def execute_task(self, task: str, repository: str = None) -> str:
         task_id = str(uuid.uuid4())
-        logger.info(f"Starting task execution - Task ID: {task_id}, Repository: {repository}")
+        logger.info("Starting task execution - Task ID: %s, Repository: %s", task_id, repository)
         
         with self.lock:
             task_status = TaskStatus(task_id, task)
-            self.tasks[task_id] = task_status
+            self.add_task(task_status)
+        self.invalidate_cached_views(task_id)
         
-        def run_task():
+        async def run_task():
             temp_dir = None
             try:
-                logger.info(f"Task {task_id}: Creating temporary directory")
+                logger.info("Task %s: Creating temporary directory", task_id)
                 # Create temporary directory for this task
-                temp_dir = tempfile.mkdtemp(prefix=f"task_{task_id[:8]}_")
-                logger.info(f"Task {task_id}: Created temp directory: {temp_dir}")
+                temp_dir = await asyncio.to_thread(tempfile.mkdtemp, prefix=f"task_{task_id[:8]}_", dir=TMP_ROOT)
+                logger.info("Task %s: Created temp directory: %s", task_id, temp_dir)
                 
                 with self.lock:
                     self.tasks[task_id].temp_dir = temp_dir
                 
                 # Clone the repository into the temp directory
                 if repository:
-                    logger.info(f"Task {task_id}: Cloning repository {repository}")
-                    if not self.clone_repository(repository, temp_dir):
+                    logger.info("Task %s: Cloning repository %s", task_id, repository)
+                    repo = await asyncio.to_thread(self.clone_repository, repository, temp_dir)
+                    if repo is None:
                         logger.error(f"Task {task_id}: Failed to clone repository: {repository}")
                         raise Exception(f"Failed to clone repository: {repository}")
-                    logger.info(f"Task {task_id}: Repository cloned successfully")
+                    with self.lock:
+                        self.tasks[task_id].repo = repo
+                    logger.info("Task %s: Repository cloned successfully", task_id)
                 else:
-                    logger.info(f"Task {task_id}: No repository specified, proceeding with task execution")
+                    logger.info("Task %s: No repository specified, proceeding with task execution", task_id)
                 
                 # Use Claude Code SDK to execute the coding task
-                logger.info(f"Task {task_id}: Starting Claude Code SDK execution")
+                logger.info("Task %s: Starting Claude Code SDK execution", task_id)
                 async def execute_claude_task():
                     options = claude_code_sdk.ClaudeCodeOptions(
                         cwd=temp_dir,
@@ -155,41 +635,35 @@ class TaskServer:
                     )
                     
                     try:
-                        messages = []
                         async for message in claude_code_sdk.query(prompt=task, options=options):
                             message_data = self.process_claude_message(message, task_id)
-                            messages.append(message_data)
+                            await asyncio.to_thread(self.record_message, task_id, message_data)
                         
-                        logger.info(f"Task {task_id}: SDK execution completed successfully")
-                        return messages
+                        logger.info("Task %s: SDK execution completed successfully", task_id)
                         
                     except CLIJSONDecodeError as e:
                         logger.error(f"Task {task_id}: Claude SDK JSON decode error: {str(e)}")
-                        return [{
+                        await asyncio.to_thread(self.record_message, task_id, {
                             "type": "ErrorMessage",
                             "content": f"Claude SDK communication error: {str(e)}\n\nThis appears to be a temporary issue with the Claude Code SDK. You can try running the task again."
-                        }]
+                        })
                     except Exception as e:
                         logger.error(f"Task {task_id}: Unexpected error during SDK execution: {str(e)}", exc_info=True)
                         raise
                 
                 # Run the async function
-                logger.info(f"Task {task_id}: Running async Claude task")
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                response = loop.run_until_complete(execute_claude_task())
-                loop.close()
-                logger.info(f"Task {task_id}: Claude task completed successfully")
+                logger.info("Task %s: Running async Claude task", task_id)
+                await execute_claude_task()
+                logger.info("Task %s: Claude task completed successfully", task_id)
                 
                 with self.lock:
                     task_status = self.tasks[task_id]
                     task_status.status = "completed"
                     task_status.end_time = datetime.now()
-                    # Store the structured messages as JSON
-                    import json
-                    task_status.output = json.dumps(response)
                     task_status.return_code = 0
-                    logger.info(f"Task {task_id}: Marked as completed successfully")
+                    self.task_updated.notify_all()
+                    logger.info("Task %s: Marked as completed successfully", task_id)
+                await asyncio.to_thread(self.invalidate_cached_views, task_id)
                     
             except Exception as e:
                 logger.error(f"Task {task_id}: Exception occurred - {type(e).__name__}: {str(e)}", exc_info=True)
@@ -199,87 +673,115 @@ class TaskServer:
                     task_status.end_time = datetime.now()
                     task_status.error = str(e)
                     task_status.return_code = -1
+                    self.task_updated.notify_all()
                     logger.error(f"Task {task_id}: Marked as failed")
+                await asyncio.to_thread(self.invalidate_cached_views, task_id)
             finally:
                 # Keep temporary directory for file inspection
                 # Note: In production, you may want to implement cleanup after some time
                 pass
         
-        thread = threading.Thread(target=run_task)
-        thread.daemon = True
-        thread.start()
+        asyncio.run_coroutine_threadsafe(run_task(), self.loop)
         
         return task_id
     
+    def invalidate_cached_views(self, task_id: str):
+        """Drop cached /status and listing responses after a task is added, finishes or is deleted"""
+        cache.delete_many(f"view//status/{task_id}", "view//tasks", "view//running", "view//completed")
+
+    def task_exists(self, task_id: str) -> bool:
+        with self.lock:
+            return self.find_task(task_id) is not None
+
+    def wait_for_task(self, task_id: str, timeout: float):
+        """Block until the task is no longer running, or the timeout passes"""
+        with self.lock:
+            task = self.find_task(task_id)
+            if task is not None:
+                self.task_updated.wait_for(lambda: task.status != "running", timeout=timeout)
+
     def get_task_status(self, task_id: str) -> Optional[Dict]:
-        logger.debug(f"Getting status for task: {task_id}")
+        logger.debug("Getting status for task: %s", task_id)
+        # Only the lookup needs the lock; a slightly stale read of the task's fields is fine
         with self.lock:
-            if task_id not in self.tasks:
-                logger.warning(f"Task not found: {task_id}")
-                return None
-            
-            task = self.tasks[task_id]
-            return {
+            task = self.find_task(task_id)
+        if task is None:
+            logger.warning("Task not found: %s", task_id)
+            return None
+        
+        status = {
+            "id": task.id,
+            "task": task.task,
+            "original_task": task.original_task,
+            "feedback_history": task.feedback_history,
+            "status": task.status,
+            "start_time": task.start_time,
+            "end_time": task.end_time,
+            "error": task.error,
+            "return_code": task.return_code,
+            "temp_dir": task.temp_dir,
+            "session_id": task.session_id
+        }
+        # Read after the status so a finished task's output is always complete
+        status["output"] = self.read_task_output(task_id)
+        return status
+    
+    def list_tasks(self) -> List[Dict]:
+        result = []
+        # LRU order isn't creation order, so list tasks by start time
+        for task in sorted(self.all_tasks(), key=lambda t: t.start_time):
+            result.append({
                 "id": task.id,
                 "task": task.task,
-                "original_task": task.original_task,
-                "feedback_history": task.feedback_history,
                 "status": task.status,
-                "start_time": task.start_time.isoformat(),
-                "end_time": task.end_time.isoformat() if task.end_time else None,
-                "output": task.output,
-                "error": task.error,
-                "return_code": task.return_code,
-                "temp_dir": task.temp_dir,
-                "session_id": task.session_id
-            }
+                "start_time": task.start_time,
+                "end_time": task.end_time,
+                "return_code": task.return_code
+            })
+        return result
     
-    def list_tasks(self) -> List[Dict]:
-        with self.lock:
-            result = []
-            for task in self.tasks.values():
-                result.append({
-                    "id": task.id,
-                    "task": task.task,
-                    "status": task.status,
-                    "start_time": task.start_time.isoformat(),
-                    "end_time": task.end_time.isoformat() if task.end_time else None,
-                    "return_code": task.return_code
-                })
-            return result
-    
-    def is_git_repository(self, directory: str) -> bool:
+    def is_git_repository(self, directory: str, repo: Optional[Repo] = None) -> bool:
         """Check if a directory is a git repository"""
+        if repo is not None:
+            return True
+        # A .git directory is enough; a single stat avoids parsing config, HEAD and refs
+        git_path = os.path.join(directory, '.git')
+        if os.path.isdir(git_path):
+            return True
+        if not os.path.isfile(git_path):
+            return False
         try:
-            # Check if directory exists
-            if not os.path.exists(directory):
-                return False
-                
-            # Try to create a Repo object - this will raise InvalidGitRepositoryError if not a git repo
-            Repo(directory)
+            # A .git file (worktree or submodule) points elsewhere, so let Repo validate it
+            Repo(directory).close()
             return True
         except (InvalidGitRepositoryError, Exception) as e:
-            logger.debug(f"Git repository check failed for {directory}: {e}")
+            logger.debug("Git repository check failed for %s: %s", directory, e)
             return False
 
-    def get_git_diff(self, directory: str) -> Optional[str]:
-        """Get raw git diff output including untracked files"""
+    def get_git_diff(self, directory: str, repo: Optional[Repo] = None, mode: str = "full") -> Optional[Union[str, List[Dict]]]:
+        """Get raw git diff output including untracked files, or just the changed files in summary mode
+
+        A passed-in cached Repo must be used under its task's repo_lock; otherwise a Repo is opened and closed here.
+        """
+        if repo is None:
+            try:
+                with Repo(directory) as repo:
+                    return self.get_git_diff(directory, repo, mode)
+            except Exception as e:
+                logger.error(f"Error opening git repository {directory}: {e}")
+                return None
         try:
-            repo = Repo(directory)
+            if mode == "summary":
+                return self.get_git_diff_summary(repo)
             
             # Build comprehensive diff including staged, unstaged, and untracked files
             diff_parts = []
             
             try:
-                # Get staged changes (--cached)
-                staged_diff = repo.git.diff('--cached', '--unified=3')
-                if staged_diff:
-                    diff_parts.append(staged_diff)
-                
-                # Get unstaged changes (working directory vs index)
-                unstaged_diff = repo.git.diff('--unified=3')
-                if unstaged_diff:
-                    diff_parts.append(unstaged_diff)
+                # Get staged and unstaged changes (working directory vs HEAD) in a single git call
+                tracked_diff = repo.git.diff(self.diff_base(repo), '--unified=3', '--no-color', '--no-ext-diff')
+                if tracked_diff:
+                    diff_parts.append(tracked_diff)
                 
                 # Get untracked files
                 untracked_files = repo.untracked_files
@@ -290,23 +792,20 @@ class TaskServer:
                             full_path = os.path.join(directory, file_path)
                             if os.path.isfile(full_path):
                                 with open(full_path, 'r', encoding='utf-8') as f:
-                                    content = f.read()
+                                    lines = f.read().splitlines()
                                 
                                 # Format as a git diff for new file
-                                untracked_diff = f"""diff --git a/{file_path} b/{file_path}
+                                header = f"""diff --git a/{file_path} b/{file_path}
 new file mode 100644
 index 0000000..{('0' * 7)}
 --- /dev/null
 +++ b/{file_path}
-@@ -0,0 +1,{len(content.splitlines())} @@
+@@ -0,0 +1,{len(lines)} @@
 """
-                                # Add each line with + prefix
-                                for line in content.splitlines():
-                                    untracked_diff += f"+{line}\n"
-                                
-                                diff_parts.append(untracked_diff)
+                                # Add each line with + prefix, joined once rather than concatenated per line
+                                diff_parts.append(header + "".join(f"+{line}\n" for line in lines))
                         except (UnicodeDecodeError, PermissionError) as e:
-                            logger.debug(f"Skipping untracked file {file_path}: {e}")
+                            logger.debug("Skipping untracked file %s: %s", file_path, e)
                             continue
                 
                 # Combine all diff parts
@@ -316,10 +815,10 @@ index 0000000..{('0' * 7)}
                     return None
                     
             except Exception as e:
-                logger.warning(f"Error getting detailed diff for {directory}: {e}")
+                logger.warning("Error getting detailed diff for %s: %s", directory, e)
                 # Fallback to simple diff
                 try:
-                    fallback_diff = repo.git.diff('HEAD', '--unified=3')
+                    fallback_diff = repo.git.diff(self.diff_base(repo), '--unified=3')
                     return fallback_diff if fallback_diff else None
                 except Exception:
                     return None
@@ -328,178 +827,280 @@ index 0000000..{('0' * 7)}
             logger.error(f"Error getting git diff for {directory}: {e}")
             return None
 
-    def clone_repository(self, repository: str, target_dir: str) -> bool:
+    def diff_base(self, repo: Repo) -> str:
+        """HEAD, or the empty tree while HEAD is unborn so a fresh repository's files still show as added"""
+        try:
+            # A one-shot rev-parse rather than head.is_valid(), which goes through the Repo's persistent cat-file pipe
+            repo.git.rev_parse('--verify', '-q', 'HEAD')
+            return 'HEAD'
+        except GitCommandError:
+            return EMPTY_TREE_SHA
+
+    def get_git_diff_summary(self, repo: Repo) -> List[Dict]:
+        """List changed files with their git status letter, without computing any hunks"""
+        changes = []
+        # -z output is NUL separated: status, path, plus a second path for renames and copies
+        fields = repo.git.diff(self.diff_base(repo), '--name-status', '-z', '--no-color', '--no-ext-diff').split('\0')
+        i = 0
+        while i < len(fields) - 1:
+            status = fields[i]
+            if status[:1] in ('R', 'C'):
+                changes.append({"status": status[0], "old_path": fields[i + 1], "path": fields[i + 2]})
+                i += 3
+            else:
+                changes.append({"status": status, "path": fields[i + 1]})
+                i += 2
+        # Untracked files show up as additions, as they do in the full diff
+        changes.extend({"status": "A", "path": path} for path in repo.untracked_files)
+        return changes
+
+    def clone_repository(self, repository: str, target_dir: str) -> Optional[Repo]:
         """Clone a GitHub repository to the target directory"""
         try:
             # Parse repository format (owner/repo or full URL)
-            if repository.startswith('https://github.com/'):
-                repo_url = repository
-            elif '/' in repository:
-                repo_url = f"https://github.com/{repository}.git"
-            else:
+            repo_path = repository.removeprefix('https://github.com/').removesuffix('.git')
+            if not REPOSITORY_PATTERN.match(repo_path) or any(part in ('.', '..') for part in repo_path.split('/')):
                 logger.error(f"Invalid repository format: {repository}")
-                return False
+                return None
+            repo_url = f"https://github.com/{repo_path}.git"
             
-            logger.info(f"Cloning repository {repo_url} to {target_dir}")
+            # Nested owner/name directories, since flattening them (e.g. a-b/c and a/b-c) can collide
+            template_path = os.path.join(TEMPLATE_DIR, repo_path)
+            if os.path.dirname(os.path.dirname(os.path.realpath(template_path))) != os.path.realpath(TEMPLATE_DIR):
+                logger.error(f"Template path for {repository} escapes the template directory")
+                return None
+            with self.lock:
+                template_lock = self.template_locks.setdefault(template_path, threading.Lock())
             
-            # Clone the repository
-            Repo.clone_from(repo_url, target_dir)
-            logger.info(f"Successfully cloned repository to {target_dir}")
-            return True
+            with template_lock:
+                if not os.path.isdir(template_path):
+                    logger.info("Cloning repository %s to template %s", repo_url, template_path)
+                    # Shallow clone - the workspace only needs the latest tree
+                    partial_path = os.path.join(TEMPLATE_PARTIAL_DIR, repo_path)
+                    shutil.rmtree(partial_path, ignore_errors=True)
+                    Repo.clone_from(repo_url, partial_path, depth=1, single_branch=True, no_tags=True).close()
+                    os.makedirs(os.path.dirname(template_path), exist_ok=True)
+                    os.replace(partial_path, template_path)
+                    self.template_refreshed[template_path] = time.monotonic()
+                elif time.monotonic() - self.template_refreshed.get(template_path, float('-inf')) > TEMPLATE_TTL_SECONDS:
+                    # Templates persist across restarts, so a stale one must catch up before this task uses it
+                    self.refresh_template(template_path)
+                    self.template_refreshed[template_path] = time.monotonic()
+                
+                logger.info("Copying template %s to %s", template_path, target_dir)
+                self.copy_template(template_path, target_dir)
+            
+            logger.info("Successfully cloned repository to %s", target_dir)
+            return Repo(target_dir)
             
         except Exception as e:
             logger.error(f"Error cloning repository {repository}: {e}", exc_info=True)
-            return False
+            # Don't leave a partial copy behind for /content to serve
+            shutil.rmtree(target_dir, ignore_errors=True)
+            os.makedirs(target_dir, exist_ok=True)
+            return None
 
-    def get_task_content(self, task_id: str) -> Optional[Dict]:
-        """Get task content - returns git diff for git repos, otherwise returns files"""
-        logger.debug(f"Getting content for task: {task_id}")
+    def copy_template(self, template_path: str, target_dir: str):
+        """Copy a template clone into a workspace.
+
+        cp only reflinks when the template and workspace share a filesystem that supports it, which is
+        not the case with the defaults (templates under DATA_DIR, workspaces on /dev/shm), so this is
+        normally a full copy.
+        """
+        try:
+            subprocess.run(['cp', '--reflink=auto', '-a', f"{template_path}/.", target_dir], check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            # cp without --reflink support (e.g. macOS)
+            logger.debug("cp --reflink failed, falling back to copytree: %s", e)
+            shutil.copytree(template_path, target_dir, symlinks=True, dirs_exist_ok=True)
+
+    def refresh_template(self, template_path: str):
+        """Fetch the latest commit into a template clone. Caller holds the template's lock."""
+        logger.info("Refreshing template %s", template_path)
+        with Repo(template_path) as repo:
+            repo.remotes.origin.fetch(depth=1)
+            repo.git.reset('--hard', 'FETCH_HEAD')
+
+    def get_task_content(self, task_id: str, mode: str = "full", metadata_only: bool = False, raw: bool = False) -> Optional[Dict]:
+        """Get task content - returns git diff for git repos, otherwise returns files
+
+        In summary mode git repos return the list of changed files instead of the full diff.
+        With metadata_only just the count of changed or listed files is returned, without any content.
+        With raw, files are returned as a tar stream instead of listing items.
+        """
+        logger.debug("Getting content for task: %s", task_id)
         with self.lock:
-            if task_id not in self.tasks:
-                logger.warning(f"Task not found when getting content: {task_id}")
+            task = self.find_task(task_id)
+            if task is None:
+                logger.warning("Task not found when getting content: %s", task_id)
                 return None
             
-            task = self.tasks[task_id]
             temp_dir = task.temp_dir
+            repo = task.repo
+            repo_lock = task.repo_lock
+        
+        if not temp_dir or not os.path.exists(temp_dir):
+            return {"is_git_repo": False, "content_type": "files", "content": [], "count": 0}
+        
+        try:
+            is_git = self.is_git_repository(temp_dir, repo)
             
-            if not temp_dir or not os.path.exists(temp_dir):
-                return {"is_git_repo": False, "content_type": "files", "content": []}
-            
-            try:
-                is_git = self.is_git_repository(temp_dir)
-                
-                if is_git:
-                    # Return git diff for git repositories
-                    try:
-                        diff = self.get_git_diff(temp_dir)
-                        return {
-                            "is_git_repo": True,
-                            "content_type": "diff",
-                            "content": diff
-                        }
-                    except Exception as e:
-                        logger.error(f"Error getting git diff for task {task_id}: {e}")
-                        return {
-                            "is_git_repo": True,
-                            "content_type": "diff",
-                            "content": None
-                        }
-                else:
-                    # Return files for non-git directories
-                    files = []
-                    for root, _, filenames in os.walk(temp_dir):
-                        for filename in filenames:
-                            file_path = os.path.join(root, filename)
-                            relative_path = os.path.relpath(file_path, temp_dir)
-                            
-                            try:
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    content = f.read()
-                                
-                                # Determine file type based on extension
-                                _, ext = os.path.splitext(filename)
-                                file_type = ext[1:] if ext else 'text'
-                                
-                                files.append({
-                                    "path": relative_path,
-                                    "name": filename,
-                                    "type": file_type,
-                                    "content": content,
-                                    "size": os.path.getsize(file_path)
-                                })
-                            except (UnicodeDecodeError, PermissionError):
-                                # Skip binary files or files we can't read
-                                files.append({
-                                    "path": relative_path,
-                                    "name": filename,
-                                    "type": "binary",
-                                    "content": "[Binary file]",
-                                    "size": os.path.getsize(file_path)
-                                })
-                    
+            if is_git:
+                # Return git diff for git repositories
+                content_type = "diff_summary" if mode == "summary" else "diff"
+                try:
+                    # Overlapping polls of the same task take turns on its cached Repo
+                    with repo_lock:
+                        if metadata_only:
+                            changes = self.get_git_diff(temp_dir, repo, "summary")
+                            return {"is_git_repo": True, "content_type": content_type, "count": len(changes)}
+                        
+                        diff = self.get_git_diff(temp_dir, repo, mode)
+                    content = {
+                        "is_git_repo": True,
+                        "content_type": content_type,
+                        "content": diff
+                    }
+                    if isinstance(diff, list):
+                        content["count"] = len(diff)
+                        content["etag"] = hashlib.blake2b(orjson.dumps(diff), digest_size=16).hexdigest()
+                    elif diff is not None:
+                        content["etag"] = hashlib.blake2b(diff.encode(), digest_size=16).hexdigest()
+                    return content
+                except Exception as e:
+                    logger.error(f"Error getting git diff for task {task_id}: {e}")
                     return {
-                        "is_git_repo": False,
-                        "content_type": "files",
-                        "content": files
+                        "is_git_repo": True,
+                        "content_type": content_type,
+                        "content": None
                     }
-            except Exception as e:
-                logger.error(f"Error in get_task_content for task {task_id}: {e}", exc_info=True)
-                return {"is_git_repo": False, "content_type": "files", "content": []}
+            else:
+                # Return files for non-git directories; their bodies are read as the content is iterated
+                entries = list(iter_files(temp_dir))
+                if metadata_only:
+                    return {"is_git_repo": False, "content_type": "files", "count": len(entries)}
+                
+                return {
+                    "is_git_repo": False,
+                    "content_type": "files",
+                    "content": stream_tar(entries, temp_dir) if raw else self.read_file_entries(entries, temp_dir),
+                    "count": len(entries),
+                    "etag": files_etag(entries)
+                }
+        except Exception as e:
+            logger.error(f"Error in get_task_content for task {task_id}: {e}", exc_info=True)
+            return {"is_git_repo": False, "content_type": "files", "content": [], "count": 0}
+
+    def read_file_entries(self, entries: List[os.DirEntry], root: str) -> Iterator[Dict]:
+        """Read files in parallel, one batch at a time so only a batch of file bodies is held in memory"""
+        for i in range(0, len(entries), CONTENT_READ_BATCH_SIZE):
+            batch = entries[i:i + CONTENT_READ_BATCH_SIZE]
+            yield from self.content_executor.map(lambda entry: read_file_entry(entry, root), batch)
 
-    def delete_task(self, task_id: str) -> bool:
+    def delete_task(self, task_id: str, remove_workspace: bool = True) -> bool:
         """Delete a task and clean up its temporary directory"""
-        logger.info(f"Deleting task: {task_id}")
+        logger.info("Deleting task: %s", task_id)
         with self.lock:
-            if task_id not in self.tasks:
-                logger.warning(f"Task not found for deletion: {task_id}")
+            task = self.find_task(task_id)
+            if task is None:
+                logger.warning("Task not found for deletion: %s", task_id)
                 return False
             
-            task = self.tasks[task_id]
-            temp_dir = task.temp_dir
-            
-            # Clean up temporary directory if it exists
-            if temp_dir and os.path.exists(temp_dir):
-                try:
-                    logger.info(f"Cleaning up temp directory: {temp_dir}")
-                    shutil.rmtree(temp_dir)
-                    logger.info(f"Successfully cleaned up temp directory: {temp_dir}")
-                except Exception as e:
-                    logger.error(f"Error cleaning up temp directory {temp_dir}: {e}", exc_info=True)
-                    # Continue with task deletion even if cleanup fails
-            
             # Remove task from memory
             del self.tasks[task_id]
-            logger.info(f"Task {task_id} deleted successfully")
-            return True
+            temp_dir = task.temp_dir
+        self.invalidate_cached_views(task_id)
+        if task.repo is not None:
+            self.close_repo(task)
+        
+        try:
+            os.remove(self.output_path(task_id))
+        except FileNotFoundError:
+            pass
+        
+        # Clean up temporary directory if it exists, outside the lock so running tasks aren't stalled
+        if remove_workspace and temp_dir and os.path.exists(temp_dir):
+            try:
+                logger.info("Cleaning up temp directory: %s", temp_dir)
+                shutil.rmtree(temp_dir)
+                logger.info("Successfully cleaned up temp directory: %s", temp_dir)
+            except Exception as e:
+                logger.error(f"Error cleaning up temp directory {temp_dir}: {e}", exc_info=True)
+                # Continue with task deletion even if cleanup fails
+        
+        logger.info("Task %s deleted successfully", task_id)
+        return True
 
     def create_pull_request(self, task_id: str, github_token: str, pr_title: str = None, pr_body: str = None) -> Dict:
         """Create a pull request for the task changes"""
-        logger.info(f"Creating pull request for task: {task_id}")
+        logger.info("Creating pull request for task: %s", task_id)
         
         with self.lock:
-            if task_id not in self.tasks:
-                logger.warning(f"Task not found for PR creation: {task_id}")
+            task = self.find_task(task_id)
+            if task is None:
+                logger.warning("Task not found for PR creation: %s", task_id)
                 return {"error": "Task not found", "success": False}
             
-            task = self.tasks[task_id]
             temp_dir = task.temp_dir
             
             if not temp_dir or not os.path.exists(temp_dir):
                 return {"error": "Task directory not found", "success": False}
             
-            if not self.is_git_repository(temp_dir):
+            if not self.is_git_repository(temp_dir, task.repo):
                 return {"error": "Task is not in a git repository", "success": False}
+            repo = task.repo
+            repo_lock = task.repo_lock
         
         try:
-            repo = Repo(temp_dir)
-            
-            # Get the remote origin URL to extract owner/repo
-            try:
-                origin_url = repo.remotes.origin.url
-                logger.info(f"Repository origin URL: {origin_url}")
+            # Content polls share the cached Repo and GitPython objects are not thread-safe, so hold its lock
+            # throughout; tasks without one (e.g. reloaded from the spill store) get a Repo closed afterwards
+            with repo_lock, (nullcontext(repo) if repo is not None else Repo(temp_dir)) as repo:
                 
-                # Parse GitHub repository info from URL
-                if 'github.com' in origin_url:
-                    if origin_url.startswith('https://github.com/'):
-                        repo_path = origin_url.replace('https://github.com/', '').replace('.git', '')
-                    elif origin_url.startswith('git@github.com:'):
-                        repo_path = origin_url.replace('git@github.com:', '').replace('.git', '')
-                    else:
-                        return {"error": "Unable to parse GitHub repository URL", "success": False}
-                    
-                    owner, repo_name = repo_path.split('/', 1)
-                else:
-                    return {"error": "Repository is not hosted on GitHub", "success": False}
+                # Get the remote origin URL to extract owner/repo
+                try:
+                    origin_url = repo.remotes.origin.url
+                    logger.info("Repository origin URL: %s", origin_url)
                     
-            except Exception as e:
-                logger.error(f"Error getting repository info: {e}")
-                return {"error": "Unable to get repository information", "success": False}
-            
-            # Check if there are any changes to commit
-            if repo.is_dirty() or repo.untracked_files:
+                    # Parse GitHub repository info from URL
+                    if 'github.com' in origin_url:
+                        if origin_url.startswith('https://github.com/'):
+                            repo_path = origin_url.replace('https://github.com/', '').replace('.git', '')
+                        elif origin_url.startswith('git@github.com:'):
+                            repo_path = origin_url.replace('git@github.com:', '').replace('.git', '')
+                        else:
+                            return {"error": "Unable to parse GitHub repository URL", "success": False}
+                        
+                        owner, repo_name = repo_path.split('/', 1)
+                    else:
+                        return {"error": "Repository is not hosted on GitHub", "success": False}
+                        
+                except Exception as e:
+                    logger.error(f"Error getting repository info: {e}")
+                    return {"error": "Unable to get repository information", "success": False}
+                
+                # Check if there are any changes to commit
+                if not (repo.is_dirty() or repo.untracked_files):
+                    return {"error": "No changes to create pull request", "success": False}
+                
+                headers = {
+                    'Authorization': f'token {github_token}'
+                }
+                
+                # Look up the default branch to use as the PR base up front, so a bad token or missing
+                # repository is reported before a branch is committed and pushed
+                repo_api_url = f'https://api.github.com/repos/{owner}/{repo_name}'
+                repo_response = github_session.get(repo_api_url, headers=headers, timeout=GITHUB_TIMEOUT_SECONDS)
+                if repo_response.status_code != 200:
+                    logger.error(f"GitHub API error: {repo_response.status_code} - {repo_response.text}")
+                    return {
+                        "error": f"GitHub API error: {repo_response.status_code} - {repo_response.json().get('message', 'Unknown error')}",
+                        "success": False
+                    }
+                base_branch = repo_response.json()['default_branch']
+                
                 # Create a new branch
                 branch_name = f"task-{task_id[:8]}-{int(datetime.now().timestamp())}"
-                logger.info(f"Creating branch: {branch_name}")
+                logger.info("Creating branch: %s", branch_name)
                 
                 try:
                     # Create and checkout new branch
@@ -514,29 +1115,24 @@ index 0000000..{('0' * 7)}
                     repo.index.commit(commit_message)
                     
                     # Push to remote
-                    logger.info(f"Pushing branch {branch_name} to remote")
+                    logger.info("Pushing branch %s to remote", branch_name)
                     origin = repo.remotes.origin
+                    # Shallow clones may be missing history the remote needs to accept the push
+                    if repo.git.rev_parse('--is-shallow-repository').strip() == 'true':
+                        logger.info("Unshallowing repository before push")
+                        origin.fetch(unshallow=True)
                     origin.push(refspec=f"{branch_name}:{branch_name}")
                     
                 except Exception as e:
                     logger.error(f"Error creating branch and pushing: {e}")
                     return {"error": f"Failed to create branch: {str(e)}", "success": False}
-            else:
-                return {"error": "No changes to create pull request", "success": False}
-            
-            # Create pull request using GitHub API
-            headers = {
-                'Authorization': f'token {github_token}',
-                'Accept': 'application/vnd.github.v3+json',
-                'Content-Type': 'application/json'
-            }
-            
-            # Default PR title and body if not provided
-            if not pr_title:
-                pr_title = f"AI Generated Changes: {task.task[:60]}..." if len(task.task) > 60 else f"AI Generated Changes: {task.task}"
-            
-            if not pr_body:
-                pr_body = f"""## AI Generated Changes
+                
+                # Default PR title and body if not provided
+                if not pr_title:
+                    pr_title = f"AI Generated Changes: {task.task[:60]}..." if len(task.task) > 60 else f"AI Generated Changes: {task.task}"
+                
+                if not pr_body:
+                    pr_body = f"""## AI Generated Changes
 
 **Task:** {task.task}
 
@@ -549,56 +1145,50 @@ This PR includes the modifications made to fulfill the requested task.
 
 ---
 *Generated automatically by Junior AI Assistant*"""
-            
-            pr_data = {
-                'title': pr_title,
-                'body': pr_body,
-                'head': branch_name,
-                'base': 'main'  # Try main first
-            }
-            
-            api_url = f'https://api.github.com/repos/{owner}/{repo_name}/pulls'
-            logger.info(f"Creating PR via GitHub API: {api_url}")
-            
-            response = requests.post(api_url, headers=headers, json=pr_data)
-            
-            # If main branch doesn't exist, try master
-            if response.status_code == 422 and 'base' in response.text:
-                logger.info("Main branch not found, trying master branch")
-                pr_data['base'] = 'master'
-                response = requests.post(api_url, headers=headers, json=pr_data)
-            
-            if response.status_code == 201:
-                pr_info = response.json()
-                logger.info(f"Pull request created successfully: {pr_info['html_url']}")
-                return {
-                    "success": True,
-                    "pr_url": pr_info['html_url'],
-                    "pr_number": pr_info['number'],
-                    "branch_name": branch_name,
-                    "message": "Pull request created successfully"
-                }
-            else:
-                logger.error(f"GitHub API error: {response.status_code} - {response.text}")
-                return {
-                    "error": f"GitHub API error: {response.status_code} - {response.json().get('message', 'Unknown error')}",
-                    "success": False
+                
+                pr_data = {
+                    'title': pr_title,
+                    'body': pr_body,
+                    'head': branch_name,
+                    'base': base_branch
                 }
                 
+                # Create pull request using GitHub API
+                api_url = f'{repo_api_url}/pulls'
+                logger.info("Creating PR via GitHub API: %s", api_url)
+                
+                response = github_session.post(api_url, headers=headers, json=pr_data, timeout=GITHUB_TIMEOUT_SECONDS)
+                
+                if response.status_code == 201:
+                    pr_info = response.json()
+                    logger.info("Pull request created successfully: %s", pr_info['html_url'])
+                    return {
+                        "success": True,
+                        "pr_url": pr_info['html_url'],
+                        "pr_number": pr_info['number'],
+                        "branch_name": branch_name,
+                        "message": "Pull request created successfully"
+                    }
+                else:
+                    logger.error(f"GitHub API error: {response.status_code} - {response.text}")
+                    return {
+                        "error": f"GitHub API error: {response.status_code} - {response.json().get('message', 'Unknown error')}",
+                        "success": False
+                    }
+                    
         except Exception as e:
             logger.error(f"Error creating pull request for task {task_id}: {e}", exc_info=True)
             return {"error": f"Failed to create pull request: {str(e)}", "success": False}
 
     def execute_feedback(self, task_id: str, feedback: str, session_id: str) -> Dict:
         """Execute feedback using Claude Code SDK with session resumption"""
-        logger.info(f"Executing feedback for task {task_id} with session {session_id}")
+        logger.info("Executing feedback for task %s with session %s", task_id, session_id)
         
         with self.lock:
-            if task_id not in self.tasks:
-                logger.warning(f"Task not found for feedback: {task_id}")
+            task_status = self.find_task(task_id)
+            if task_status is None:
+                logger.warning("Task not found for feedback: %s", task_id)
                 return {"error": "Task not found", "success": False}
-            
-            task_status = self.tasks[task_id]
         
         temp_dir = task_status.temp_dir
         
@@ -619,14 +1209,17 @@ This PR includes the modifications made to fulfill the requested task.
         feedback_task_status = TaskStatus(feedback_task_id, f"Feedback: {feedback}", original_task)
         feedback_task_status.feedback_history = feedback_history
         feedback_task_status.temp_dir = temp_dir
+        feedback_task_status.repo = task_status.repo
+        feedback_task_status.repo_lock = task_status.repo_lock
         feedback_task_status.session_id = session_id
         
         with self.lock:
-            self.tasks[feedback_task_id] = feedback_task_status
+            self.add_task(feedback_task_status)
+        self.invalidate_cached_views(feedback_task_id)
         
-        def run_feedback_task():
+        async def run_feedback_task():
             try:
-                logger.info(f"Feedback task {feedback_task_id}: Starting Claude Code SDK execution with session resumption")
+                logger.info("Feedback task %s: Starting Claude Code SDK execution with session resumption", feedback_task_id)
                 
                 async def execute_claude_feedback():
                     options = claude_code_sdk.ClaudeCodeOptions(
@@ -637,38 +1230,36 @@ This PR includes the modifications made to fulfill the requested task.
                     )
                     
                     try:
-                        messages = []
                         async for message in claude_code_sdk.query(prompt=feedback, options=options):
                             message_data = self.process_claude_message(message, feedback_task_id)
-                            messages.append(message_data)
+                            await asyncio.to_thread(self.record_message, feedback_task_id, message_data)
                         
-                        logger.info(f"Feedback task {feedback_task_id}: SDK execution completed successfully")
-                        return messages
+                        logger.info("Feedback task %s: SDK execution completed successfully", feedback_task_id)
                         
                     except CLIJSONDecodeError as e:
                         logger.error(f"Feedback task {feedback_task_id}: Claude SDK JSON decode error: {str(e)}")
-                        return [{
+                        await asyncio.to_thread(self.record_message, feedback_task_id, {
                             "type": "ErrorMessage",
                             "content": f"Claude SDK communication error: {str(e)}\n\nThis appears to be a temporary issue with the Claude Code SDK. You can try running the task again."
-                        }]
+                        })
                     except Exception as e:
                         logger.error(f"Feedback task {feedback_task_id}: Unexpected error: {str(e)}", exc_info=True)
-                        return [{
+                        await asyncio.to_thread(self.record_message, feedback_task_id, {
                             "type": "ErrorMessage",
                             "content": f"Unexpected error: {str(e)}"
-                        }]
+                        })
                 
                 # Run the async function
-                messages = asyncio.run(execute_claude_feedback())
+                await execute_claude_feedback()
                 
-                # Store the output
                 with self.lock:
-                    feedback_task_status.output = json.dumps(messages)
                     feedback_task_status.status = "completed"
                     feedback_task_status.end_time = datetime.now()
                     feedback_task_status.return_code = 0
+                    self.task_updated.notify_all()
+                await asyncio.to_thread(self.invalidate_cached_views, feedback_task_id)
                 
-                logger.info(f"Feedback task {feedback_task_id}: Task completed successfully")
+                logger.info("Feedback task %s: Task completed successfully", feedback_task_id)
                 
             except Exception as e:
                 logger.error(f"Feedback task {feedback_task_id}: Error during execution: {str(e)}", exc_info=True)
@@ -677,11 +1268,11 @@ This PR includes the modifications made to fulfill the requested task.
                     feedback_task_status.status = "failed"
                     feedback_task_status.end_time = datetime.now()
                     feedback_task_status.return_code = 1
+                    self.task_updated.notify_all()
+                await asyncio.to_thread(self.invalidate_cached_views, feedback_task_id)
         
-        # Run the feedback task in a thread
-        thread = threading.Thread(target=run_feedback_task)
-        thread.daemon = True
-        thread.start()
+        # Run the feedback task on the shared event loop
+        asyncio.run_coroutine_threadsafe(run_feedback_task(), self.loop)
         
         return {
             "success": True,
@@ -690,135 +1281,217 @@ This PR includes the modifications made to fulfill the requested task.
         }
 
 server = TaskServer()
+atexit.register(server.shutdown)
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return ojsonify({"error": "Request body too large"}, 413)
+
+@app.route('/', methods=['GET'])
+def api_docs():
+    return Response(API_DOCS, mimetype='text/plain')
 
 @app.route('/execute', methods=['POST'])
 def execute_task():
+    # Outside the try so oversized bodies get a 413; malformed JSON reads as None
+    data = request.get_json(silent=True)
     try:
-        data = request.get_json()
-        logger.info(f"Received execute request: {data}")
-        if not data or 'task' not in data:
+        logger.info("Received execute request: %s", data)
+        if not isinstance(data, dict) or 'task' not in data:
             logger.warning("Missing 'task' field in request")
-            return jsonify({"error": "Missing 'task' field"}), 400
+            return ojsonify({"error": "Missing 'task' field"}, 400)
     
         task = data['task']
         repository = data.get('repository')  # Optional repository parameter
         task_id = server.execute_task(task, repository)
         
-        logger.info(f"Task submitted successfully with ID: {task_id}")
-        return jsonify({
+        logger.info("Task submitted successfully with ID: %s", task_id)
+        return ojsonify({
             "task_id": task_id,
             "message": "Task submitted for execution"
         })
     except Exception as e:
         logger.error(f"Error in execute_task endpoint: {e}", exc_info=True)
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 @app.route('/status/<task_id>', methods=['GET'])
+@cache.cached(timeout=STATUS_CACHE_TIMEOUT, unless=lambda: 'wait' in request.args, response_filter=is_cacheable)
 def get_status(task_id):
     try:
-        logger.debug(f"Status request for task: {task_id}")
+        logger.debug("Status request for task: %s", task_id)
+        # Long poll: hold the request until the task finishes or the wait runs out
+        wait = request.args.get('wait', type=float)
+        if wait is not None and not math.isfinite(wait):
+            return ojsonify({"error": "wait must be a finite number of seconds"}, 400)
+        if wait:
+            server.wait_for_task(task_id, max(0.0, min(wait, MAX_STATUS_WAIT_SECONDS)))
+        
         status = server.get_task_status(task_id)
         if status is None:
-            return jsonify({"error": "Task not found"}), 404
+            return ojsonify({"error": "Task not found"}, 404)
         
-        return jsonify(status)
+        return ojsonify(status)
     except Exception as e:
         logger.error(f"Error in get_status endpoint for task {task_id}: {e}", exc_info=True)
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
+
+@app.route('/output/<task_id>', methods=['GET'])
+def get_output(task_id):
+    try:
+        logger.debug("Output request for task: %s", task_id)
+        output_path = server.output_path(task_id)
+        if not os.path.exists(output_path):
+            return ojsonify({"error": "Output not found"}, 404)
+        
+        return send_file(output_path, mimetype='application/x-ndjson')
+    except Exception as e:
+        logger.error(f"Error in get_output endpoint for task {task_id}: {e}", exc_info=True)
+        return ojsonify({"error": "Internal server error"}, 500)
+
+@app.route('/stream/<task_id>', methods=['GET'])
+@app.route('/events/<task_id>', methods=['GET'])
+def stream_task(task_id):
+    try:
+        logger.debug("Stream request for task: %s", task_id)
+        if not server.task_exists(task_id):
+            return ojsonify({"error": "Task not found"}, 404)
+        
+        # Resume after the last event a reconnecting client received
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        offset = int(last_event_id) if last_event_id.isdigit() else 0
+        
+        return Response(
+            stream_with_context(server.stream_task_messages(task_id, offset)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache'}
+        )
+    except Exception as e:
+        logger.error(f"Error in stream_task endpoint for task {task_id}: {e}", exc_info=True)
+        return ojsonify({"error": "Internal server error"}, 500)
 
 @app.route('/tasks', methods=['GET'])
+@cache.cached(timeout=LIST_CACHE_TIMEOUT, response_filter=is_cacheable)
 def list_tasks():
     try:
         logger.debug("Listing all tasks")
         tasks = server.list_tasks()
-        return jsonify({
-            "tasks": tasks,
-            "total": len(tasks)
-        })
+        return list_response("tasks", tasks, "total")
     except Exception as e:
         logger.error(f"Error in list_tasks endpoint: {e}", exc_info=True)
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 @app.route('/running', methods=['GET'])
+@cache.cached(timeout=LIST_CACHE_TIMEOUT, response_filter=is_cacheable)
 def list_running():
     try:
         logger.debug("Listing running tasks")
         all_tasks = server.list_tasks()
         running = [task for task in all_tasks if task['status'] == 'running']
-        return jsonify({
-            "running_tasks": running,
-            "count": len(running)
-        })
+        return list_response("running_tasks", running, "count")
     except Exception as e:
         logger.error(f"Error in list_running endpoint: {e}", exc_info=True)
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 @app.route('/completed', methods=['GET'])
+@cache.cached(timeout=LIST_CACHE_TIMEOUT, response_filter=is_cacheable)
 def list_completed():
     try:
         logger.debug("Listing completed tasks")
         all_tasks = server.list_tasks()
         completed = [task for task in all_tasks if task['status'] in ['completed', 'failed']]
-        return jsonify({
-            "completed_tasks": completed,
-            "count": len(completed)
-        })
+        return list_response("completed_tasks", completed, "count")
     except Exception as e:
         logger.error(f"Error in list_completed endpoint: {e}", exc_info=True)
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 @app.route('/content/<task_id>', methods=['GET'])
 def get_task_content(task_id):
     try:
-        logger.debug(f"Content request for task: {task_id}")
-        content_data = server.get_task_content(task_id)
-        if content_data is None:
-            return jsonify({"error": "Task not found"}), 404
-
-        response = {
-            "task_id": task_id,
-            "is_git_repo": content_data["is_git_repo"],
-            "content_type": content_data["content_type"],
-            "content": content_data["content"]
-        }
+        logger.debug("Content request for task: %s", task_id)
+        mode = request.args.get('mode', 'full')
+        if mode not in ('full', 'summary'):
+            return ojsonify({"error": "mode must be 'full' or 'summary'"}, 400)
         
-        # Add count for files content type
-        if content_data["content_type"] == "files" and isinstance(content_data["content"], list):
-            response["count"] = len(content_data["content"])
+        # ?metadata=1 returns the content type and count without any file bodies or diff
+        metadata_only = request.args.get('metadata', '').lower() in ('1', 'true')
+        # ?raw=1, or an Accept header preferring text or tar over JSON, skips the JSON envelope
+        preferred = request.accept_mimetypes.best_match(
+            ['application/json', 'text/plain', 'application/x-tar', 'application/octet-stream'], default='application/json'
+        )
+        raw_param = request.args.get('raw', '').lower() in ('1', 'true')
+        raw = raw_param or preferred != 'application/json'
+        content_data = server.get_task_content(task_id, mode, metadata_only, raw)
+        if content_data is None:
+            return ojsonify({"error": "Task not found"}, 404)
         
-        return jsonify(response)
+        if metadata_only:
+            content_data.pop("content", None)
+            return ojsonify({"task_id": task_id, **content_data})
+
+        # Diffs are only served raw as text and file listings only as tar
+        acceptable = RAW_CONTENT_MIMETYPES[content_data["content_type"]]
+        if raw and not raw_param and preferred not in acceptable:
+            response = ojsonify({
+                "error": f"{content_data['content_type']} content is available as application/json or {', '.join(acceptable)}"
+            }, 406)
+            response.vary.add('Accept')
+            return response
+
+        # Feedback tasks keep changing the shared workspace, so clients must revalidate every time.
+        # The ETag is weak because gzipped and plain bodies are equivalent but not byte-identical.
+        etag = content_data.pop("etag", None)
+        if etag and raw:
+            etag += "-raw"
+        if etag and request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        elif raw:
+            response = raw_content_response(content_data)
+        else:
+            fields = {"task_id": task_id}
+            fields.update((key, value) for key, value in content_data.items() if key != "content")
+            
+            # File listings are serialized as they are read instead of being built up in memory first
+            response = Response(
+                stream_with_context(stream_json_object(fields, content_data["content"])),
+                mimetype='application/json'
+            )
+        if etag:
+            response.set_etag(etag, weak=True)
+        response.cache_control.no_cache = True
+        response.vary.add('Accept')
+        return response
     except Exception as e:
         logger.error(f"Error in get_task_content endpoint for task {task_id}: {e}", exc_info=True)
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 @app.route('/delete/<task_id>', methods=['DELETE'])
 def delete_task(task_id):
     try:
-        logger.info(f"Delete request for task: {task_id}")
+        logger.info("Delete request for task: %s", task_id)
         success = server.delete_task(task_id)
         if not success:
-            return jsonify({"error": "Task not found"}), 404
+            return ojsonify({"error": "Task not found"}, 404)
         
-        return jsonify({
+        return ojsonify({
             "message": "Task deleted successfully",
             "task_id": task_id
         })
     except Exception as e:
         logger.error(f"Error in delete_task endpoint for task {task_id}: {e}", exc_info=True)
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 @app.route('/create-pr/<task_id>', methods=['POST'])
 def create_pr(task_id):
+    data = request.get_json(silent=True)
     try:
-        data = request.get_json()
-        logger.info(f"PR creation request for task: {task_id}")
+        logger.info("PR creation request for task: %s", task_id)
         
-        if not data:
-            return jsonify({"error": "Request body required"}), 400
+        if not isinstance(data, dict) or not data:
+            return ojsonify({"error": "Request body required"}, 400)
         
         github_token = data.get('github_token')
         if not github_token:
-            return jsonify({"error": "GitHub token is required"}), 400
+            return ojsonify({"error": "GitHub token is required"}, 400)
         
         pr_title = data.get('pr_title')
         pr_body = data.get('pr_body')
@@ -826,65 +1499,59 @@ def create_pr(task_id):
         result = server.create_pull_request(task_id, github_token, pr_title, pr_body)
         
         if result.get('success'):
-            return jsonify(result)
+            return ojsonify(result)
         else:
-            return jsonify(result), 400
+            return ojsonify(result, 400)
             
     except Exception as e:
         logger.error(f"Error in create_pr endpoint for task {task_id}: {e}", exc_info=True)
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 @app.route('/feedback/<task_id>', methods=['POST'])
 def send_feedback(task_id):
+    data = request.get_json(silent=True)
     try:
-        data = request.get_json()
-        logger.info(f"Feedback request for task: {task_id}")
+        logger.info("Feedback request for task: %s", task_id)
         
-        if not data:
-            return jsonify({"error": "Request body required"}), 400
+        if not isinstance(data, dict) or not data:
+            return ojsonify({"error": "Request body required"}, 400)
         
         feedback = data.get('feedback')
         if not feedback:
-            return jsonify({"error": "Feedback text is required"}), 400
+            return ojsonify({"error": "Feedback text is required"}, 400)
         
         # Get the task to retrieve session_id
         task_status = server.get_task_status(task_id)
         if not task_status:
-            return jsonify({"error": "Task not found"}), 404
+            return ojsonify({"error": "Task not found"}, 404)
         
         session_id = task_status.get('session_id')
         if not session_id:
-            return jsonify({"error": "No session ID found for this task"}), 400
+            return ojsonify({"error": "No session ID found for this task"}, 400)
         
         # Execute feedback with session resumption
         result = server.execute_feedback(task_id, feedback, session_id)
         
         if result.get('success'):
-            return jsonify(result)
+            return ojsonify(result)
         else:
-            return jsonify(result), 400
+            return ojsonify(result, 400)
             
     except Exception as e:
         logger.error(f"Error in feedback endpoint for task {task_id}: {e}", exc_info=True)
-        return jsonify({"error": "Internal server error"}), 500
+        return ojsonify({"error": "Internal server error"}, 500)
 
 if __name__ == '__main__':
-    logger.info("Coding Task Execution Server starting...")
-    logger.info("API Endpoints:")
-    logger.info("  POST /execute - Submit a coding task for execution")
-    logger.info("  GET /status/<task_id> - Get status of a specific task")
-    logger.info("  GET /content/<task_id> - Get task content (git diff for repos, files otherwise)")
-    logger.info("  DELETE /delete/<task_id> - Delete a task and clean up its temp directory")
-    logger.info("  POST /create-pr/<task_id> - Create a GitHub pull request for task changes")
-    logger.info("  GET /tasks - List all tasks")
-    logger.info("  GET /running - List running tasks")
-    logger.info("  GET /completed - List completed tasks")
-    logger.info("")
-    logger.info("Using Claude Code SDK for task execution")
-    logger.info("Server will run on port 8080")
+    logger.info("Coding Task Execution Server starting on port 8080 (Claude Code SDK)\n%s", API_DOCS)
     
+    # Standalone fallback; deployments run under gunicorn with gunicorn_conf.py.
+    # waitress serves from a fixed thread pool, unlike the dev server's thread per request.
     try:
-        app.run(port=8080, debug=False, threaded=True)
+        if os.environ.get('FLASK_DEV'):
+            app.run(port=8080, debug=False, threaded=True)
+        else:
+            from waitress import serve
+            serve(app, host='127.0.0.1', port=8080, threads=int(os.environ.get('JUNIOR_THREADS', '32')))
     except Exception as e:
         logger.critical(f"Failed to start server: {e}", exc_info=True)
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,23 @@
+# Gunicorn settings for the command server: uv run gunicorn -c gunicorn_conf.py command_server:app
+import os
+
+# Localhost only by default: the API is unauthenticated and runs Claude with bypassPermissions.
+# Set JUNIOR_BIND (e.g. 0.0.0.0:8080) to expose it more widely.
+bind = os.environ.get('JUNIOR_BIND', '127.0.0.1:8080')
+
+# Task records, the asyncio loop thread and the template locks live in process memory,
+# so everything must be served by a single worker; concurrency comes from its threads.
+# gevent is not used because monkey-patching breaks the background asyncio loop thread.
+workers = 1
+worker_class = 'gthread'
+# Each open /stream or /events connection holds a thread for its lifetime
+threads = int(os.environ.get('JUNIOR_THREADS', '32'))
+# Polling clients reuse their connection between requests; the app never sets Connection itself
+# since it is a hop-by-hop header that WSGI applications must leave to the server
+keepalive = 5
+
+def worker_exit(server, worker):
+    # Save task records and stop the task loop here rather than only from atexit: by the time atexit
+    # handlers run, the interpreter has already waited for executor threads such as a clone in progress
+    from command_server import server as task_server
+    task_server.shutdown()
@@ -44,7 +44,7 @@ fi
 # Start backend server
 echo -e "${GREEN}📡 Starting backend server...${NC}"
 cd backend
-if ! uv run command_server.py > ../backend.log 2>&1 &
+if ! uv run gunicorn -c gunicorn_conf.py command_server:app > ../backend.log 2>&1 &
 then
     error_exit "Failed to start backend server"
 fi